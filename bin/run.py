@@ -7,21 +7,130 @@ Load up a model, process a WAV, and save.
 """
 
 import json
+import wave
 from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional, Union
 
-from nam.data import wav_to_tensor, tensor_to_wav
+import numpy as np
+import torch
+
+from nam.data import REQUIRED_RATE
 from nam.models import Model
 
+_SAMPWIDTH = 3  # 24-bit
+# Samples are read into the top 3 bytes of an int32, so this maps them to [-1, 1)
+_READ_SCALE = np.float32(1.0 / (1 << 31))
+_WRITE_SCALE = float(1 << (8 * _SAMPWIDTH - 1))
+# Largest value that fits; 1.0 itself would wrap around to -1.0 in 24 bits.
+_WRITE_MAX = (_WRITE_SCALE - 1.0) / _WRITE_SCALE
+
+
+def _check_input(fp: wave.Wave_read, filename: Union[str, Path]):
+    if fp.getnchannels() != 1:
+        raise ValueError(f"Expected a mono input, but {filename} isn't!")
+    if fp.getsampwidth() != _SAMPWIDTH:
+        raise ValueError(f"Expected a 24-bit input, but {filename} isn't!")
+    if fp.getframerate() != REQUIRED_RATE:
+        raise ValueError(
+            f"Explicitly expected sample rate of {REQUIRED_RATE}, but found "
+            f"{fp.getframerate()} in file {filename}!"
+        )
+
+
+def _frames_to_tensor(frames: bytes) -> torch.Tensor:
+    """
+    24-bit little-endian PCM frames to a float tensor in [-1, 1)
+    """
+    b = np.frombuffer(frames, dtype=np.uint8).reshape((-1, _SAMPWIDTH))
+    # Put each sample in the top 3 bytes of an int32 so the sign comes out right.
+    x = np.zeros((len(b), 4), dtype=np.uint8)
+    x[:, 1:] = b
+    arr = x.view("<i4")[:, 0].astype(np.float32)
+    arr *= _READ_SCALE
+    return torch.from_numpy(arr)
+
+
+def _tensor_to_frames(y: torch.Tensor) -> bytes:
+    """
+    Inverse of _frames_to_tensor(), matching nam.data.np_to_wav()
+    """
+    y = np.clip(y.detach().cpu().numpy(), -1.0, _WRITE_MAX)
+    y *= _WRITE_SCALE
+    return y.astype("<i4").view(np.uint8).reshape((-1, 4))[:, :_SAMPWIDTH].tobytes()
+
+
+def _process(
+    model: Model,
+    source_path: Union[str, Path],
+    outfile: Union[str, Path],
+    chunk_size: Optional[int] = None,
+):
+    """
+    Stream the source through the model and into the output file.
+
+    Each chunk is prepended with the last (receptive field - 1) input samples of the
+    one before it so that the output is the same as processing the whole file at
+    once. (Recurrent models restart from their initial state at each chunk, though.)
+
+    :param chunk_size: Samples to process at a time. If None, do the whole file at
+        once.
+    """
+    if chunk_size is not None and chunk_size < 1:
+        raise ValueError(f"Chunk size must be positive; got {chunk_size}")
+    with wave.open(str(source_path), "rb") as fp_in:
+        # Check before making the output so a bad input doesn't leave a file behind.
+        _check_input(fp_in, source_path)
+        fp_out = wave.open(str(outfile), "wb")
+        try:
+            fp_out.setnchannels(1)
+            fp_out.setsampwidth(_SAMPWIDTH)
+            fp_out.setframerate(REQUIRED_RATE)
+            _stream(
+                model,
+                fp_in,
+                fp_out,
+                fp_in.getnframes() if chunk_size is None else chunk_size,
+            )
+        except BaseException:
+            fp_out.close()
+            Path(outfile).unlink()
+            raise
+        fp_out.close()
+
+
+def _stream(
+    model: Model, fp_in: wave.Wave_read, fp_out: wave.Wave_write, blocksize: int
+):
+    net = model.net
+    context_length = net.receptive_field - 1
+    # The first chunk is padded like the whole file would have been.
+    context = torch.zeros((context_length if net.pad_start_default else 0,))
+    while True:
+        frames = fp_in.readframes(blocksize)
+        if len(frames) == 0:
+            break
+        x = torch.cat((context, _frames_to_tensor(frames)))
+        if len(x) <= context_length:
+            # Unpadded start that's still too short to give any output; keep reading.
+            context = x
+            continue
+        with torch.inference_mode():
+            y = model(x, pad_start=False)
+        fp_out.writeframes(_tensor_to_frames(y))
+        context = x[len(x) - context_length :]
+
 
 def main(args):
-    source = wav_to_tensor(args.source_path)
+    # Check before loading anything so we don't waste the time.
+    if args.no_overwrite and Path(args.outfile).exists():
+        raise FileExistsError(f"Output file {args.outfile} already exists!")
     with open(args.model_config_path, "r") as fp:
         model = Model.load_from_checkpoint(
             args.checkpoint, **Model.parse_config(json.load(fp))
         )
     model.eval()
-    output = model(source)
-    tensor_to_wav(output, args.outfile)
+    _process(model, args.source_path, args.outfile, chunk_size=args.chunk_size)
 
 
 if __name__ == "__main__":
@@ -30,4 +139,15 @@ if __name__ == "__main__":
     parser.add_argument("model_config_path", type=str)
     parser.add_argument("checkpoint", type=str)
     parser.add_argument("outfile")
+    parser.add_argument(
+        "--chunk-size",
+        type=int,
+        help="Process this many samples at a time to limit memory use. Recurrent "
+        "models (e.g. LSTM) start again from their initial state at each chunk.",
+    )
+    parser.add_argument(
+        "--no-overwrite",
+        action="store_true",
+        help="Fail (before doing any work) instead of replacing an existing output",
+    )
     main(parser.parse_args())
@@ -55,6 +55,25 @@ class AudioShapeMismatchError(ValueError):
         return self._shape_actual
 
 
+def _full_scale(sampwidth: int) -> int:
+    """
+    Integer value corresponding to 1.0 at the given sample width
+    """
+    return 1 << (8 * sampwidth - 1)
+
+
+def _int_to_float(x: np.ndarray, sampwidth: int, dtype: type) -> np.ndarray:
+    """
+    Scale integer samples to floats in [-1, 1).
+
+    One cast and one in-place multiply, so there's no float64 intermediate when a
+    float32 array is requested.
+    """
+    arr = x.astype(dtype)
+    arr *= dtype(1.0 / _full_scale(sampwidth))
+    return arr
+
+
 def wav_to_np(
     filename: Union[str, Path],
     rate: Optional[int] = REQUIRED_RATE,
@@ -63,9 +82,11 @@ def wav_to_np(
     required_wavinfo: Optional[WavInfo] = None,
     preroll: Optional[int] = None,
     info: bool = False,
+    dtype: type = np.float64,
 ) -> Union[np.ndarray, Tuple[np.ndarray, WavInfo]]:
     """
     :param preroll: Drop this many samples off the front
+    :param dtype: Floating-point type of the returned array
     """
     x_wav = wavio.read(str(filename))
     assert x_wav.data.shape[1] == _REQUIRED_CHANNELS, "Mono"
@@ -87,7 +108,7 @@ def wav_to_np(
             raise ValueError(
                 f"Mismatched rates {x_wav.rate} versus {required_wavinfo.rate}"
             )
-    arr_premono = x_wav.data[preroll:] / (2.0 ** (8 * x_wav.sampwidth - 1))
+    arr_premono = x_wav.data[preroll:]
     if required_shape is not None:
         if arr_premono.shape != required_shape:
             raise AudioShapeMismatchError(
@@ -97,20 +118,21 @@ def wav_to_np(
                 f"{arr_premono.shape}!",
             )
         # sampwidth fine--we're just casting to 32-bit float anyways
-    arr = arr_premono[:, 0]
+    arr = _int_to_float(arr_premono[:, 0], x_wav.sampwidth, dtype)
     return arr if not info else (arr, WavInfo(x_wav.sampwidth, x_wav.rate))
 
 
 def wav_to_tensor(
     *args, info: bool = False, **kwargs
 ) -> Union[torch.Tensor, Tuple[torch.Tensor, WavInfo]]:
-    out = wav_to_np(*args, info=info, **kwargs)
+    # Convert straight to float32 so that torch can use the array without a copy.
+    out = wav_to_np(*args, info=info, dtype=np.float32, **kwargs)
     if info:
         arr, info = out
-        return torch.Tensor(arr), info
+        return torch.from_numpy(arr), info
     else:
         arr = out
-        return torch.Tensor(arr)
+        return torch.from_numpy(arr)
 
 
 def tensor_to_wav(x: torch.Tensor, *args, **kwargs):
@@ -124,9 +146,12 @@ def np_to_wav(
     sampwidth: int = 3,
     scale="none",
 ):
+    # Scale the clipped copy in place rather than allocating another array.
+    x = np.clip(x, -1.0, 1.0)
+    x *= _full_scale(sampwidth)
     wavio.write(
         str(filename),
-        (np.clip(x, -1.0, 1.0) * (2 ** (8 * sampwidth - 1))).astype(np.int32),
+        x.astype(np.int32),
         rate,
         scale=scale,
         sampwidth=sampwidth,
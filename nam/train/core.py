@@ -7,6 +7,7 @@ Functions used by the GUI trainer.
 """
 
 import hashlib
+import threading
 from enum import Enum
 from time import time
 from typing import Optional, Union
@@ -351,6 +352,20 @@ def _plot(
     if not silent:
         plt.show()
 
+class _StopWhenSet(pl.Callback):
+    """
+    Stop training after the current batch once the event is set (e.g. from another
+    thread)
+    """
+
+    def __init__(self, event: threading.Event):
+        self._event = event
+
+    def on_train_batch_end(self, trainer, *args, **kwargs):
+        if self._event.is_set():
+            trainer.should_stop = True
+
+
 def train(
     input_path: str,
     output_path: str,
@@ -364,8 +379,13 @@ def train(
     seed: Optional[int] = 0,
     save_plot: bool=False,
     silent: bool=False,
-    modelname: str="model"
+    modelname: str="model",
+    stop_event: Optional[threading.Event] = None,
 ):
+    """
+    :param stop_event: If provided, training stops early (and the best model so far is
+        used) once this is set.
+    """
     if seed is not None:
         torch.manual_seed(seed)
 
@@ -408,7 +428,8 @@ def train(
             pl.callbacks.model_checkpoint.ModelCheckpoint(
                 filename="checkpoint_last_{epoch:04d}_{step}", every_n_epochs=1
             ),
-        ],
+        ]
+        + ([] if stop_event is None else [_StopWhenSet(stop_event)]),
         default_root_dir=train_path,
         **learning_config["trainer"],
     )
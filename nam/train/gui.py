@@ -24,24 +24,45 @@ def _ensure_graceful_shutdowns():
 
 _ensure_graceful_shutdowns()
 
-import re
+import base64
+import importlib
+import io
+import queue
+import sys
+import threading
 import tkinter as tk
+import traceback
+import warnings
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import redirect_stdout
 from dataclasses import dataclass
 from enum import Enum
+from functools import lru_cache
+from io import BytesIO
 from pathlib import Path
-from tkinter import filedialog
-from typing import Callable, Optional, Sequence
-
-try:
-    from nam import __version__
+from tkinter import filedialog, messagebox
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
+
+# nam is imported where it's needed so that a broken install can still get as far as
+# run() and show _install_error().
+if TYPE_CHECKING:
     from nam.train import core
-
-    _install_is_valid = True
-except ImportError:
-    _install_is_valid = False
 _BUTTON_WIDTH = 20
 _BUTTON_HEIGHT = 2
 _TEXT_WIDTH = 70
+_LOG_HEIGHT = 10
+_POLL_INTERVAL_MS = 200
 
 _DEFAULT_NUM_EPOCHS = 100
 _DEFAULT_DELAY = None
@@ -49,11 +70,98 @@ _DEFAULT_DELAY = None
 
 @dataclass
 class _AdvancedOptions(object):
-    architecture: core.Architecture
+    architecture: "core.Architecture"
     num_epochs: int
     delay: Optional[int]
 
 
+@dataclass
+class _TrainJob(object):
+    """
+    Everything needed to train (and export) one model
+    """
+
+    input_path: str
+    output_path: Path
+    train_path: str
+    modelname: str
+    kwargs: Dict[str, Any]
+
+
+class _QueueWriter(io.TextIOBase):
+    """
+    Stand-in for stdout that puts what's written onto a queue so that the Tk thread can
+    display it. Tk isn't thread-safe, so the worker must never touch widgets directly.
+
+    It's not a terminal and has no file descriptor (.isatty() and .fileno() are
+    io.TextIOBase's), which is what progress bars and the like look for.
+    """
+
+    def __init__(self, q: queue.Queue, stream=None):
+        """
+        :param stream: If provided, also write to this (e.g. the original stdout)
+        """
+        super().__init__()
+        self._queue = q
+        self._stream = stream
+
+    @property
+    def encoding(self) -> str:
+        return getattr(self._stream, "encoding", None) or "utf-8"
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, s: str) -> int:
+        self._queue.put(s)
+        if self._stream is not None:
+            self._stream.write(s)
+        return len(s)
+
+    def flush(self):
+        if self._stream is not None:
+            self._stream.flush()
+
+
+def _resolve_carriage_returns(s: str) -> Tuple[bool, str]:
+    """
+    Progress bars redraw their line by writing "\r" and then the new line. Keep only
+    what would be left showing.
+
+    :return: Whether the line being written to should be cleared first, and the text
+        to write after that.
+    """
+    lines = s.replace("\r\n", "\n").split("\n")
+    return "\r" in lines[0], "\n".join(line.rsplit("\r", 1)[-1] for line in lines)
+
+
+def _write(msg: str):
+    """
+    Write a (possibly multi-line) message to stdout in one go
+    """
+    sys.stdout.write(msg)
+    sys.stdout.flush()
+
+
+def _pop_figures(keep: bool) -> List[bytes]:
+    """
+    Close all of Matplotlib's open figures.
+
+    :param keep: If True, return them rendered as PNGs
+    """
+    import matplotlib.pyplot as plt
+
+    pngs = []
+    for num in plt.get_fignums():
+        fig = plt.figure(num)
+        if keep:
+            buf = BytesIO()
+            fig.savefig(buf, format="png")
+            pngs.append(buf.getvalue())
+        plt.close(fig)
+    return pngs
+
+
 class _PathType(Enum):
     FILE = "file"
     DIRECTORY = "directory"
@@ -127,9 +235,33 @@ class _PathButton(object):
 
 
 class _GUI(object):
-    def __init__(self):
-        self._root = tk.Tk()
+    def __init__(self, root: Optional[tk.Tk] = None):
+        """
+        :param root: If provided, build the GUI in this (empty) window
+        """
+        # Training (and so plotting) happens on a worker thread, so Matplotlib mustn't
+        # make Tk windows of its own. Figures are shown by ._show_plots() instead.
+        import matplotlib
+
+        matplotlib.use("Agg")
+        # plt.show() doesn't do anything with Agg; we show the plots afterwards.
+        # (Registered once here: warnings.catch_warnings() on the worker would swap
+        # out the filters for every thread.)
+        warnings.filterwarnings("ignore", message=".*non-GUI backend.*")
+        from nam import __version__
+        from nam.train import core
+
+        self._root = tk.Tk() if root is None else root
         self._root.title(f"NAM Trainer - v{__version__}")
+        self._root.protocol("WM_DELETE_WINDOW", self._close)
+        # Training is done on a worker thread so that the GUI stays responsive.
+        self._executor = ThreadPoolExecutor(max_workers=1)
+        self._log_queue = queue.Queue()
+        self._training = False
+        # Set to ask the worker to stop
+        self._stop_event = threading.Event()
+        self._pending_check = False
+        self._train_state = None
 
         # Buttons for paths:
         self._frame_input_path = tk.Frame(self._root)
@@ -139,7 +271,7 @@ class _GUI(object):
             "Input Audio",
             "Input audio",
             _PathType.FILE,
-            hooks=[self._check_button_states],
+            hooks=[self._request_check],
         )
 
         self._frame_output_path = tk.Frame(self._root)
@@ -149,7 +281,7 @@ class _GUI(object):
             "Output Audio",
             "Output audio",
             _PathType.MULTIFILE,
-            hooks=[self._check_button_states],
+            hooks=[self._request_check],
         )
 
         self._frame_train_destination = tk.Frame(self._root)
@@ -159,7 +291,7 @@ class _GUI(object):
             "Train Destination",
             "Train destination",
             _PathType.DIRECTORY,
-            hooks=[self._check_button_states],
+            hooks=[self._request_check],
         )
 
         # This should probably be to the right somewhere
@@ -195,8 +327,30 @@ class _GUI(object):
             command=self._train,
         )
         self._button_train.pack()
+        self._button_stop = tk.Button(
+            self._frame_train,
+            text="Stop",
+            width=_BUTTON_WIDTH,
+            height=_BUTTON_HEIGHT,
+            fg="black",
+            state=tk.DISABLED,
+            command=self._stop,
+        )
+        self._button_stop.pack()
+
+        # Training log
+        self._frame_log = tk.Frame(self._root)
+        self._frame_log.pack()
+        self._text_log = tk.Text(
+            self._frame_log,
+            width=_BUTTON_WIDTH + _TEXT_WIDTH,
+            height=_LOG_HEIGHT,
+            fg="black",
+            state=tk.DISABLED,
+        )
+        self._text_log.pack()
 
-        self._check_button_states()
+        self._do_check()
 
     def _get_additional_options_frame(self):
         # Checkboxes
@@ -225,13 +379,40 @@ class _GUI(object):
     def mainloop(self):
         self._root.mainloop()
 
+    def _close(self):
+        """
+        If a model is training, it's stopped (after the current batch) and exported
+        before the process exits. No further models are started.
+        """
+        if self._training:
+            if not messagebox.askokcancel(
+                "Quit",
+                "A model is training. Stop it and quit?\n"
+                "(The model trained so far will still be exported.)",
+                parent=self._root,
+            ):
+                return
+            self._stop_event.set()
+        # Jobs are submitted one at a time, so there are none queued to cancel.
+        self._executor.shutdown(wait=False)
+        self._root.destroy()
+
+    def _stop(self):
+        """
+        Stop training after the current batch. The model trained so far is exported,
+        and the remaining files are skipped.
+        """
+        self._stop_event.set()
+        self._button_stop["state"] = tk.DISABLED
+        self._append_log("Stopping...\n")
+
     def _open_advanced_options(self):
         """
         Open advanced options
         """
         ao = _AdvancedOptionsGUI(self)
         # I should probably disable the main GUI...
-        ao.mainloop()
+        self._root.wait_window(ao._root)
         # ...and then re-enable it once it gets closed.
 
     def _train(self):
@@ -249,51 +430,183 @@ class _GUI(object):
         seed = 0
 
         # Run it
-        for file in file_list:
-            print("Now training {}".format(file))
-            modelname = re.sub(r"\.wav$", "", file.split("/")[-1])
-
-            trained_model = core.train(
+        jobs = [
+            _TrainJob(
                 self._path_button_input.val,
                 file,
                 self._path_button_train_destination.val,
-                epochs=num_epochs,
-                delay=delay,
-                architecture=architecture,
-                lr=lr,
-                lr_decay=lr_decay,
-                seed=seed,
-                silent=self._silent.get(),
-                save_plot=self._save_plot.get(),
-                modelname=modelname,
+                file.stem,
+                dict(
+                    epochs=num_epochs,
+                    delay=delay,
+                    architecture=architecture,
+                    lr=lr,
+                    lr_decay=lr_decay,
+                    seed=seed,
+                    silent=self._silent.get(),
+                    save_plot=self._save_plot.get(),
+                ),
             )
-            print("Model training complete!")
-            print("Exporting...")
-            outdir = self._path_button_train_destination.val
-            print(f"Exporting trained model to {outdir}...")
-            trained_model.net.export(outdir, modelname=modelname)
-            print("Done!")
-
-    def _check_button_states(self):
+            for file in map(Path, file_list)
+        ]
+        self._training = True
+        self._stop_event.clear()
+        self._button_stop["state"] = tk.NORMAL
+        self._do_check()
+        self._submit_next(iter(jobs))
+
+    def _train_one(self, job: _TrainJob) -> List[bytes]:
         """
-        Determine if any buttons should be disabled
+        Train and export one model. Runs on the worker thread.
+
+        :return: The plots that were made, as PNGs, unless this is a silent run.
         """
-        # Train button is diabled unless all paths are set
-        if any(
-            pb.val is None
-            for pb in (
-                self._path_button_input,
-                self._path_button_output,
-                self._path_button_train_destination,
-            )
-        ):
-            self._button_train["state"] = tk.DISABLED
+        from nam.train import core
+
+        with redirect_stdout(_QueueWriter(self._log_queue, stream=sys.stdout)):
+            try:
+                _write("Now training {}\n".format(job.output_path))
+                trained_model = core.train(
+                    job.input_path,
+                    str(job.output_path),
+                    job.train_path,
+                    modelname=job.modelname,
+                    stop_event=self._stop_event,
+                    **job.kwargs,
+                )
+                outdir = Path(job.train_path)
+                status = "stopped early" if self._stop_event.is_set() else "complete!"
+                _write(
+                    f"Model training {status}\n"
+                    "Exporting...\n"
+                    f"Exporting trained model to {outdir}...\n"
+                )
+                trained_model.net.export(outdir, modelname=job.modelname)
+                _write("Done!\n")
+            except BaseException:
+                # Don't leave this run's figures behind for the next one.
+                _pop_figures(False)
+                raise
+        return _pop_figures(not job.kwargs["silent"])
+
+    def _submit_next(self, jobs_iter: Iterator[_TrainJob]):
+        """
+        Start the next job, or wrap up if there are none left.
+        """
+        job = None if self._stop_event.is_set() else next(jobs_iter, None)
+        if job is None:
+            self._training = False
+            self._button_stop["state"] = tk.DISABLED
+            self._request_check()
             return
-        self._button_train["state"] = tk.NORMAL
+        fut = self._executor.submit(self._train_one, job)
+        self._root.after(_POLL_INTERVAL_MS, self._poll, fut, jobs_iter)
+
+    def _poll(self, fut: Future, jobs_iter: Iterator[_TrainJob]):
+        """
+        Check on the running job from the Tk thread.
+        """
+        done = fut.done()  # Check before draining so that we don't miss anything
+        self._drain_log()
+        if not done:
+            self._root.after(_POLL_INTERVAL_MS, self._poll, fut, jobs_iter)
+            return
+        exc = fut.exception()
+        if exc is not None:
+            self._append_log(
+                "".join(traceback.format_exception(type(exc), exc, exc.__traceback__))
+            )
+            # Don't carry on with the rest of the files.
+            jobs_iter = iter(())
+        else:
+            self._show_plots(fut.result())
+        self._submit_next(jobs_iter)
+
+    def _show_plots(self, pngs: Sequence[bytes]):
+        for png in pngs:
+            window = tk.Toplevel(self._root)
+            window.title("Plot")
+            label = tk.Label(window)
+            label.image = tk.PhotoImage(master=window, data=base64.b64encode(png))
+            label["image"] = label.image  # (Keep a reference on the label)
+            label.pack()
+
+    def _drain_log(self):
+        chunks = []
+        while True:
+            try:
+                chunks.append(self._log_queue.get_nowait())
+            except queue.Empty:
+                break
+        if chunks:
+            self._append_log("".join(chunks))
+
+    def _append_log(self, s: str):
+        self._text_log["state"] = tk.NORMAL
+        clear_line, s = _resolve_carriage_returns(s)
+        if clear_line:
+            self._text_log.delete("end-1c linestart", "end-1c")
+        self._text_log.insert(tk.END, s)
+        self._text_log.see(tk.END)
+        self._text_log["state"] = tk.DISABLED
+
+    def _request_check(self):
+        """
+        Ask for the button states to be checked once Tk is idle. Several requests
+        before then are coalesced into one check.
+        """
+        if not self._pending_check:
+            self._pending_check = True
+            self._root.after_idle(self._do_check)
+
+    def _do_check(self):
+        """
+        Determine if any buttons should be disabled
+        """
+        self._pending_check = False
+        # Train button is diabled while training and unless all paths are set
+        disabled = (
+            self._training
+            or self._path_button_input.val is None
+            or self._path_button_output.val is None
+            or self._path_button_train_destination.val is None
+        )
+        train_state = tk.DISABLED if disabled else tk.NORMAL
+        # Only touch the widget if something changed.
+        if train_state != self._train_state:
+            self._button_train["state"] = train_state
+            self._train_state = train_state
 
 
 _ADVANCED_OPTIONS_LEFT_WIDTH = 12
 _ADVANCED_OPTIONS_RIGHT_WIDTH = 12
+_INVALID_BG = "#ffcccc"
+
+
+# Tk variables for the advanced options, reused each time the dialog is opened
+_VAR_POOL: Dict[Tuple[Type[tk.Variable], str], tk.Variable] = {}
+
+
+def _pooled_var(
+    variable_class: Type[tk.Variable], master: tk.Misc, name: str, value
+) -> tk.Variable:
+    """
+    Get the Tk variable with this name, making it if needed, and set it to value.
+    """
+    key = (variable_class, name)
+    var = _VAR_POOL.get(key)
+    # (Don't reuse one from an interpreter that's been torn down)
+    if var is None or var._root is not master._root():
+        var = variable_class(master=master, value=value, name=name)
+        _VAR_POOL[key] = var
+    elif value is not None:
+        var.set(value)
+    return var
+
+
+@lru_cache
+def _choice_values(choices: Type[Enum]) -> Tuple[str, ...]:
+    return tuple(choice.value for choice in choices)
 
 
 class _LabeledOptionMenu(object):
@@ -302,7 +615,11 @@ class _LabeledOptionMenu(object):
     """
 
     def __init__(
-        self, frame: tk.Frame, label: str, choices: Enum, default: Optional[Enum] = None
+        self,
+        frame: tk.Frame,
+        label: str,
+        choices: Type[Enum],
+        default: Optional[Enum] = None,
     ):
         """
         :param command: Called to propagate option selection. Is provided with the
@@ -327,28 +644,44 @@ class _LabeledOptionMenu(object):
         frame_menu = tk.Frame(frame)
         frame_menu.pack(side=tk.RIGHT)
 
-        self._selected_value = None
-        default = (list(choices)[0] if default is None else default).value
+        choice_values = _choice_values(choices)
+        default = choice_values[0] if default is None else default.value
+        # Keep a reference so that the variable isn't garbage-collected.
+        self._var = _pooled_var(tk.StringVar, frame, label, default)
         self._menu = tk.OptionMenu(
             frame_menu,
-            tk.StringVar(master=frame, value=default, name=label),
-            # default,
-            *[choice.value for choice in choices],  #  if choice.value!=default],
+            self._var,
+            *choice_values,
             command=self._set,
         )
         self._menu.config(width=_ADVANCED_OPTIONS_RIGHT_WIDTH)
         self._menu.pack(side=tk.RIGHT)
-        # Initialize
-        self._set(default)
 
     def get(self) -> Enum:
-        return self._selected_value
+        return self._choices(self._var.get())
 
     def _set(self, val: str):
         """
         Set the value selected
         """
-        self._selected_value = self._choices(val)
+        self._var.set(val)
+
+
+def _is_non_negative_int_prefix(val: str) -> bool:
+    """
+    Could this be (the start of) a non-negative integer?
+    """
+    # (isdigit() alone lets through non-ASCII digits that int() may not parse)
+    return val == "" or (val.isascii() and val.isdigit())
+
+
+def _is_int_or_null_prefix(val: str) -> bool:
+    """
+    Could this be (the start of) an integer or "null"?
+    """
+    return _is_non_negative_int_prefix(val[1:] if val.startswith("-") else val) or (
+        "null".startswith(val)
+    )
 
 
 class _LabeledText(object):
@@ -356,15 +689,23 @@ class _LabeledText(object):
     Label (left) and text input (right)
     """
 
-    def __init__(self, frame: tk.Frame, label: str, default=None, type=None):
+    def __init__(
+        self,
+        frame: tk.Frame,
+        label: str,
+        default=None,
+        type=None,
+        validate: Optional[Callable[[str], bool]] = None,
+    ):
         """
         :param command: Called to propagate option selection. Is provided with the
             value corresponding to the radio button selected.
         :param type: If provided, casts value to given type
+        :param validate: If provided, keystrokes are rejected unless this returns True
+            for what the text would become.
         """
         self._frame = frame
         label_height = 2
-        text_height = 1
         self._label = tk.Label(
             frame,
             width=_ADVANCED_OPTIONS_LEFT_WIDTH,
@@ -376,29 +717,41 @@ class _LabeledText(object):
         )
         self._label.pack(side=tk.LEFT)
 
-        self._text = tk.Text(
+        self._var = _pooled_var(tk.StringVar, frame, label, default)
+        validate_kwargs = (
+            {}
+            if validate is None
+            else dict(validate="key", validatecommand=(frame.register(validate), "%P"))
+        )
+        self._entry = tk.Entry(
             frame,
             width=_ADVANCED_OPTIONS_RIGHT_WIDTH,
-            height=text_height,
             fg="black",
             bg=None,
+            textvariable=self._var,
+            **validate_kwargs,
         )
-        self._text.pack(side=tk.RIGHT)
+        self._entry.pack(side=tk.RIGHT)
+        self._entry_bg = self._entry["bg"]
 
         self._type = type
 
-        if default is not None:
-            self._text.insert("1.0", str(default))
-
     def get(self):
         try:
-            val = self._text.get("1.0", tk.END)  # Line 1, character zero (wat)
+            val = self._var.get()
             if self._type is not None:
                 val = self._type(val)
             return val
-        except tk.TclError:
+        except (tk.TclError, ValueError):
+            # Incomplete (e.g. empty)
             return None
 
+    def set_invalid(self, invalid: bool):
+        """
+        Highlight (or un-highlight) the entry to say that it needs fixing
+        """
+        self._entry["bg"] = _INVALID_BG if invalid else self._entry_bg
+
 
 class _AdvancedOptionsGUI(object):
     """
@@ -406,8 +759,13 @@ class _AdvancedOptionsGUI(object):
     """
 
     def __init__(self, parent: _GUI):
+        from nam.train import core
+
         self._parent = parent
-        self._root = tk.Tk()
+        # A child of the main window, so it shares its interpreter and mainloop.
+        self._root = tk.Toplevel(parent._root)
+        # Stay hidden while the widgets are added so the window is laid out once.
+        self._root.withdraw()
         self._root.title("Advanced Options")
 
         # Architecture: radio buttons
@@ -435,6 +793,7 @@ class _AdvancedOptionsGUI(object):
             "Epochs",
             default=str(self._parent.advanced_options.num_epochs),
             type=non_negative_int,
+            validate=_is_non_negative_int_prefix,
         )
 
         # Delay: text box
@@ -442,7 +801,6 @@ class _AdvancedOptionsGUI(object):
         self._frame_delay.pack()
 
         def int_or_null(val):
-            val = val.rstrip()
             if val == "null":
                 return val
             return int(val)
@@ -455,6 +813,7 @@ class _AdvancedOptionsGUI(object):
             "Delay",
             default=int_or_null_inv(self._parent.advanced_options.delay),
             type=int_or_null,
+            validate=_is_int_or_null_prefix,
         )
 
         # "Ok": apply and destory
@@ -470,26 +829,31 @@ class _AdvancedOptionsGUI(object):
         )
         self._button_ok.pack()
 
-    def mainloop(self):
-        self._root.mainloop()
+        # One geometry pass for everything, then show it.
+        self._root.update_idletasks()
+        self._root.deiconify()
 
     def _apply_and_destroy(self):
         """
-        Set values to parent and destroy this object
+        Set values to parent and destroy this object.
+
+        If a field is incomplete, it's highlighted and nothing is applied.
         """
-        self._parent.advanced_options.architecture = self._architecture.get()
         epochs = self._epochs.get()
-        if epochs is not None:
-            self._parent.advanced_options.num_epochs = epochs
+        # Value None is returned as "null" to disambiguate from incomplete.
         delay = self._delay.get()
-        # Value None is returned as "null" to disambiguate from non-set.
-        if delay is not None:
-            self._parent.advanced_options.delay = None if delay == "null" else delay
+        self._epochs.set_invalid(epochs is None)
+        self._delay.set_invalid(delay is None)
+        if epochs is None or delay is None:
+            return
+        self._parent.advanced_options.architecture = self._architecture.get()
+        self._parent.advanced_options.num_epochs = epochs
+        self._parent.advanced_options.delay = None if delay == "null" else delay
         self._root.destroy()
 
 
-def _install_error():
-    window = tk.Tk()
+def _install_error(window: Optional[tk.Tk] = None):
+    window = tk.Tk() if window is None else window
     window.title("ERROR")
     label = tk.Label(
         window,
@@ -504,11 +868,22 @@ def _install_error():
 
 
 def run():
-    if _install_is_valid:
-        _gui = _GUI()
-        _gui.mainloop()
-    else:
-        _install_error()
+    # Importing the training code (PyTorch, Lightning...) takes a while, so put the
+    # window up first.
+    root = tk.Tk()
+    root.title("NAM Trainer")
+    loading = tk.Label(root, width=45, height=2, text="Loading...")
+    loading.pack()
+    root.update()
+    try:
+        importlib.import_module("nam.train.core")
+    except ImportError:
+        loading.destroy()
+        _install_error(root)
+        return
+    loading.destroy()
+    _gui = _GUI(root)
+    _gui.mainloop()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,131 @@
+# File: test_run.py
+# Created Date: Wednesday October 14th 2026
+# Author: Steven Atkinson (steven@atkinson.mn)
+
+import importlib.util
+import wave
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+import numpy as np
+import pytest
+import torch
+
+from nam import data
+from nam.models import Model
+from nam.models.conv_net import ConvNet
+
+
+def _load_run():
+    # bin/ isn't a package, so load the script from its path.
+    path = Path(__file__).parents[2] / "bin" / "run.py"
+    spec = importlib.util.spec_from_file_location("_bin_run", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+run = _load_run()
+
+# One 24-bit quantization step, plus some slack for float32 arithmetic
+_ATOL = 2.0**-22
+
+
+def _write_source(path: Path, n: int = 50) -> np.ndarray:
+    x = 0.1 * (2.0 * np.random.rand(n) - 1.0)
+    data.np_to_wav(x, path)
+    return data.wav_to_np(path)
+
+
+def _construct_model(pad_start: bool = True) -> Model:
+    net = ConvNet(3, [1, 2, 4], batchnorm=False, activation="Tanh")
+    net._pad_start_default = pad_start
+    model = Model(net)
+    model.eval()
+    return model
+
+
+def _t_process(model: Model, chunk_size):
+    with TemporaryDirectory() as tmpdir:
+        source_path = Path(tmpdir, "source.wav")
+        outfile = Path(tmpdir, "output.wav")
+        _write_source(source_path)
+        with torch.no_grad():
+            expected = model(data.wav_to_tensor(source_path)).numpy()
+        run._process(model, source_path, outfile, chunk_size=chunk_size)
+        actual = data.wav_to_np(outfile)
+    assert actual.shape == expected.shape
+    assert np.allclose(actual, expected, atol=_ATOL)
+
+
+@pytest.mark.parametrize("chunk_size", (None, 1, 3, 7, 8, 100))
+def test_process_padded(chunk_size):
+    """
+    Chunked output matches processing the whole file, including chunks shorter than
+    the receptive field.
+    """
+    model = _construct_model()
+    assert model.net.receptive_field == 8, "Invalid test!"
+    _t_process(model, chunk_size)
+
+
+@pytest.mark.parametrize("chunk_size", (None, 1, 3, 7, 8, 100))
+def test_process_unpadded(chunk_size):
+    """
+    Same, for a net that doesn't pad its start, so the first chunks are too short to
+    give any output on their own.
+    """
+    _t_process(_construct_model(pad_start=False), chunk_size)
+
+
+def test_process_bad_input_leaves_no_output():
+    with TemporaryDirectory() as tmpdir:
+        source_path = Path(tmpdir, "stereo.wav")
+        outfile = Path(tmpdir, "output.wav")
+        with wave.open(str(source_path), "wb") as fp:
+            fp.setnchannels(2)
+            fp.setsampwidth(3)
+            fp.setframerate(data.REQUIRED_RATE)
+            fp.writeframes(bytes(6 * 10))
+        with pytest.raises(ValueError):
+            run._process(_construct_model(), source_path, outfile)
+        assert not outfile.exists()
+
+
+def test_frames_to_tensor():
+    """
+    Reading frames agrees with nam.data.wav_to_np()
+    """
+    with TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir, "x.wav")
+        data.np_to_wav(np.array([-1.0, -0.5, 0.0, 0.25, 0.999]), path)
+        expected = data.wav_to_np(path)
+        with wave.open(str(path), "rb") as fp:
+            actual = run._frames_to_tensor(fp.readframes(fp.getnframes()))
+    assert actual.dtype == torch.float32
+    assert np.allclose(actual.numpy(), expected)
+
+
+def test_tensor_to_frames():
+    """
+    Writing frames agrees with nam.data.np_to_wav(), including at and beyond full
+    scale
+    """
+    x = torch.Tensor([-1.5, -1.0, -0.5, 0.0, 0.25, 0.999, 1.0, 1.5])
+    with TemporaryDirectory() as tmpdir:
+        path = Path(tmpdir, "x.wav")
+        expected_path = Path(tmpdir, "expected.wav")
+        with wave.open(str(path), "wb") as fp:
+            fp.setnchannels(1)
+            fp.setsampwidth(3)
+            fp.setframerate(data.REQUIRED_RATE)
+            fp.writeframes(run._tensor_to_frames(x))
+        data.np_to_wav(x.numpy(), expected_path)
+        actual = data.wav_to_np(path)
+        expected = data.wav_to_np(expected_path)
+    assert np.all(actual == expected)
+    assert np.allclose(actual, np.clip(x.numpy(), -1.0, 1.0), atol=_ATOL)
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -4,6 +4,8 @@
 
 import math
 from enum import Enum
+from pathlib import Path
+from tempfile import TemporaryDirectory
 from typing import Tuple
 
 import numpy as np
@@ -233,5 +235,27 @@ class TestDataset(object):
         return x_out, y_out
 
 
+class TestWav(object):
+    """
+    Assertions about reading and writing WAV files
+    """
+
+    def test_wav_to_tensor_round_trip(self):
+        """
+        Assert that writing a signal and reading it back gives a float32 tensor that
+        matches it up to the 24-bit quantization.
+        """
+        x = 0.99 * (2.0 * np.random.rand(100) - 1.0)
+        with TemporaryDirectory() as tmpdir:
+            filename = Path(tmpdir, "x.wav")
+            data.np_to_wav(x, filename)
+            x_np = data.wav_to_np(filename)
+            x_tensor = data.wav_to_tensor(filename)
+        assert x_np.dtype == np.float64
+        assert x_tensor.dtype == torch.float32
+        assert np.allclose(x_np, x, atol=2.0**-23)
+        assert np.allclose(x_tensor.numpy(), x_np)
+
+
 if __name__ == "__main__":
     pytest.main()
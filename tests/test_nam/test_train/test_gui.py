@@ -0,0 +1,87 @@
+# File: test_gui.py
+# Created Date: Wednesday October 14th 2026
+# Author: Steven Atkinson (steven@atkinson.mn)
+
+import queue
+
+import pytest
+from tqdm import tqdm
+
+from nam.train import gui
+
+
+@pytest.mark.parametrize(
+    "val,valid",
+    (
+        ("", True),
+        ("0", True),
+        ("100", True),
+        ("010", True),
+        ("-", False),
+        ("-1", False),
+        ("1.5", False),
+        ("1a", False),
+        ("null", False),
+        ("²", False),  # Superscript two
+        ("٣", False),  # Arabic-Indic three
+    ),
+)
+def test_is_non_negative_int_prefix(val: str, valid: bool):
+    assert gui._is_non_negative_int_prefix(val) == valid
+
+
+@pytest.mark.parametrize(
+    "val,valid",
+    (
+        ("", True),
+        ("-", True),
+        ("-12", True),
+        ("12", True),
+        ("n", True),
+        ("nul", True),
+        ("null", True),
+        ("nulll", False),
+        ("-null", False),
+        ("--1", False),
+        ("1-", False),
+        ("a", False),
+        ("-²", False),
+    ),
+)
+def test_is_int_or_null_prefix(val: str, valid: bool):
+    assert gui._is_int_or_null_prefix(val) == valid
+
+
+@pytest.mark.parametrize(
+    "s,expected",
+    (
+        ("abc\n", (False, "abc\n")),
+        ("\r10%\r20%", (True, "20%")),
+        ("a\r\nb\n", (False, "a\nb\n")),
+        ("\r90%\r100%\nDone!\n", (True, "100%\nDone!\n")),
+        ("x\ny\rz", (False, "x\nz")),
+    ),
+)
+def test_resolve_carriage_returns(s, expected):
+    assert gui._resolve_carriage_returns(s) == expected
+
+
+def test_queue_writer_progress_bar():
+    """
+    A progress bar written through the queue comes out as one line of text.
+    """
+    q = queue.Queue()
+    writer = gui._QueueWriter(q)
+    assert not writer.isatty()
+    for _ in tqdm(range(100), file=writer, mininterval=0):
+        pass
+    chunks = []
+    while not q.empty():
+        chunks.append(q.get_nowait())
+    clear_line, s = gui._resolve_carriage_returns("".join(chunks))
+    assert clear_line
+    assert s.count("\n") == 1 and s.startswith("100%")
+
+
+if __name__ == "__main__":
+    pytest.main()